@@ -1,101 +1,571 @@
 import os
-import requests
-from urllib.parse import urljoin, quote_plus, urlencode
-from bs4 import BeautifulSoup
+import io
+from requests_cache import CachedSession, DO_NOT_CACHE
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import quote_plus, urlencode, urlparse
 import time
 import re
 import json
-import PyPDF2
+import hashlib
+import functools
+import sqlite3
+import argparse
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections import defaultdict
+
+# Retry transient upstream errors on every request
+_retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+
+# Search endpoints get a Retry that leaves 429/503 and Retry-After to search_get
+SEARCH_PREFIXES = [
+    'http://export.arxiv.org/api/',
+    'https://doaj.org/api/',
+    'https://eutils.ncbi.nlm.nih.gov/',
+    'https://api.plos.org/',
+    'https://core.ac.uk',
+]
+_search_retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 504],
+                      respect_retry_after_header=False)
+
+_session = None
+_session_lock = threading.Lock()
+
+# Worker threads for each pipeline stage (extraction runs in EXTRACT_WORKERS
+# processes), with at most HOST_CONCURRENCY downloads in flight per host
+DOWNLOAD_WORKERS = 8
+EXTRACT_WORKERS = 4
+LLM_WORKERS = 2
+HOST_CONCURRENCY = 4
+
+# Bounds of the pipeline queues. Downloads keep running while the LLM judges
+# earlier papers; the extract and verdict queues each hold up to PREFETCH_DEPTH
+# papers, so up to 2 * PREFETCH_DEPTH downloaded papers (plus those held by
+# workers) can be waiting for a verdict.
+DOWNLOAD_QUEUE_SIZE = 64
+PREFETCH_DEPTH = 32
+
+# Papers larger than this are not downloaded
+MAX_PDF_BYTES = 100 * 1024 * 1024
+# Files smaller than this are too small to be a real paper
+MIN_PDF_BYTES = 1024
+
+_pdfium_lock = threading.Lock()
+# Search requests and PDF downloads are rate limited per host as
+# (requests per second on average, burst size). arXiv asks API clients for
+# one request every 3 seconds.
+HOST_RATE_LIMITS = {
+    'export.arxiv.org': (1 / 3, 1),
+    'arxiv.org': (1.0, 2),
+}
+DEFAULT_RATE_LIMIT = (3.0, 6)
+
+_host_semaphores = {}
+_host_buckets = {}
+_host_limits_lock = threading.Lock()
+
+# Papers are sent to the LLM in batches of up to LLM_BATCH_SIZE, or whatever
+# has accumulated after LLM_BATCH_WAIT seconds
+LLM_BATCH_SIZE = 16
+LLM_BATCH_WAIT = 5.0
+
+# Relevance prompts. The query goes in the system prompt so Ollama sees the same
+# prefix for every paper of a query and can reuse its KV-cache.
+SYSTEM_PROMPT = ("You judge whether research papers are relevant to the query: {query}\n"
+                 "For each numbered paper, answer YES or NO on its own line, e.g. \"1. YES\".")
+USER_PROMPT = "Title: {title}\nExcerpt: {text}"
+
+# Words ignored by the keyword prefilter
+STOPWORDS = frozenset({'the', 'a', 'an', 'of', 'and', 'for', 'to', 'in', 'on', 'with', 'using'})
+_TOK = re.compile(r'\w+')
+
+# Concurrent page fetches when paginating search results
+PAGE_CONCURRENCY = 4
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+OPENSEARCH_NS = '{http://a9.com/-/spec/opensearch/1.1/}'
+
+def _create_session(use_cache):
+    if use_cache:
+        session = CachedSession('.http_cache', backend='sqlite', expire_after=86400,
+                                allowable_codes=(200,), allowable_methods=('GET',))
+    else:
+        session = CachedSession(backend='memory')
+        session.settings.disabled = True
+    session.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=_retry))
+    session.mount('http://', HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=_retry))
+    for prefix in SEARCH_PREFIXES:
+        session.mount(prefix, HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=_search_retry))
+    return session
+
+def init_session(use_cache=True):
+    """Create the shared HTTP session used for every request.
+    
+    Connections to each host are kept alive and reused. Search responses are
+    cached on disk for a day; downloads opt out per request. With
+    use_cache=False nothing is written to disk and the cache is bypassed.
+    """
+    global _session
+    with _session_lock:
+        _session = _create_session(use_cache)
+        return _session
+
+def get_session():
+    """Return the shared HTTP session, creating the cached one on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session(use_cache=True)
+        return _session
 
 def create_directory(path):
     """Create directory if it doesn't exist"""
     if not os.path.exists(path):
         os.makedirs(path)
 
+# Control characters become spaces and invalid file characters become underscores
+_FILENAME_TABLE = str.maketrans({c: '_' for c in '<>:"/\\|?*'} | {'\n': ' ', '\r': ' ', '\t': ' '})
+_RE_WS = re.compile(r'\s+')
+
+@functools.lru_cache(maxsize=4096)
 def sanitize_filename(filename):
     """Remove invalid characters and clean up filename"""
-    # Remove newlines, tabs, and other control characters
-    filename = re.sub(r'[\n\r\t]', ' ', filename)
-    # Remove invalid file characters
-    filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
+    # Remove control characters and invalid file characters
+    filename = filename.translate(_FILENAME_TABLE)
     # Replace multiple spaces with single space
-    filename = re.sub(r'\s+', ' ', filename)
+    filename = _RE_WS.sub(' ', filename)
     # Limit length and strip whitespace
     return filename.strip()[:150]
 
-def download_file(url, filepath, headers=None):
+def host_semaphore(url):
+    """Return the per-host semaphore that limits concurrent requests to a host"""
+    host = urlparse(url).netloc
+    with _host_limits_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.Semaphore(HOST_CONCURRENCY)
+        return _host_semaphores[host]
+
+class TokenBucket:
+    """Thread-safe token bucket allowing short bursts while capping the average rate"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available and take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def host_bucket(url):
+    """Return the per-host token bucket that rate limits requests to a host"""
+    host = urlparse(url).netloc
+    with _host_limits_lock:
+        if host not in _host_buckets:
+            _host_buckets[host] = TokenBucket(*HOST_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT))
+        return _host_buckets[host]
+
+def search_get(url, max_attempts=5, **kwargs):
+    """GET a search endpoint within its host's rate limit, backing off on 429/503"""
+    # Serve fresh cached responses without spending a rate-limit token
+    response = get_session().get(url, only_if_cached=True, **kwargs)
+    if response.status_code != 504:
+        return response
+    response.close()
+    
+    bucket = host_bucket(url)
+    for attempt in range(max_attempts):
+        bucket.acquire()
+        response = get_session().get(url, **kwargs)
+        if response.status_code not in (429, 503) or attempt == max_attempts - 1:
+            return response
+        
+        # Honour Retry-After when given in seconds, otherwise back off exponentially
+        retry_after = response.headers.get('Retry-After', '')
+        delay = int(retry_after) if retry_after.isdigit() else 2 ** attempt
+        response.close()
+        time.sleep(min(60, delay))
+
+def download_file(url, filepath, headers=None, download_meta=None):
     """Download file from URL with error handling"""
+    # Write to a temporary name so a failed download never replaces a good file
+    part_path = filepath + '.part'
+    # Pace requests to the host before taking one of its connection slots
+    host_bucket(url).acquire()
     try:
-        response = requests.get(url, headers=headers, timeout=60)
-        response.raise_for_status()
-        with open(filepath, 'wb') as f:
-            f.write(response.content)
+        with host_semaphore(url), get_session().get(url, headers=headers, timeout=60, stream=True,
+                                                  expire_after=DO_NOT_CACHE) as response:
+            response.raise_for_status()
+            
+            # Skip oversized files and anything that isn't a PDF (e.g. HTML error pages)
+            if int(response.headers.get('Content-Length', '0')) > MAX_PDF_BYTES:
+                print(f"Skipping {url}: larger than {MAX_PDF_BYTES // (1024 * 1024)} MB")
+                return False, None
+            response.raw.decode_content = True
+            magic = response.raw.read(4)
+            if magic != b'%PDF':
+                print(f"Skipping {url}: not a PDF")
+                return False, None
+            
+            # Stream to disk in chunks instead of holding the whole PDF in memory,
+            # enforcing the size limit even when there was no Content-Length
+            size = len(magic)
+            with open(part_path, 'wb') as f:
+                f.write(magic)
+                while chunk := response.raw.read(65536):
+                    size += len(chunk)
+                    if size > MAX_PDF_BYTES:
+                        break
+                    f.write(chunk)
+            if size > MAX_PDF_BYTES:
+                print(f"Skipping {url}: larger than {MAX_PDF_BYTES // (1024 * 1024)} MB")
+                os.remove(part_path)
+                return False, None
+        os.replace(part_path, filepath)
+        
+        if download_meta is not None:
+            download_meta.put(filepath, url, response.headers.get('ETag'),
+                              response.headers.get('Last-Modified'))
         return True, filepath
     except Exception as e:
         print(f"Failed to download {url}: {e}")
+        if os.path.exists(part_path):
+            os.remove(part_path)
         return False, None
 
+def is_unchanged(filepath, download_meta, headers=None):
+    """Check with a conditional HEAD request whether a downloaded file is still current"""
+    record = download_meta.get(filepath)
+    if record is None or not (record[1] or record[2]):
+        return True  # Nothing to revalidate against, keep the existing file
+    url, etag, last_modified = record
+    
+    conditional = dict(headers or {})
+    if etag:
+        conditional['If-None-Match'] = etag
+    if last_modified:
+        conditional['If-Modified-Since'] = last_modified
+    
+    host_bucket(url).acquire()
+    try:
+        with host_semaphore(url):
+            response = get_session().head(url, headers=conditional, timeout=30, allow_redirects=True,
+                                    expire_after=DO_NOT_CACHE)
+    except Exception as e:
+        print(f"Failed to revalidate {url}: {e}")
+        return True
+    
+    if response.status_code != 200:
+        return True  # 304 Not Modified, or the server doesn't answer HEAD
+    # Some servers ignore conditional headers, so only a stored validator that
+    # differs counts as a change
+    if etag and response.headers.get('ETag') != etag:
+        return False
+    if last_modified and response.headers.get('Last-Modified') != last_modified:
+        return False
+    return True
+
+def _extract_pdf_text_pypdf2(filepath):
+    """Extract text with PyPDF2 (slower fallback for files PDFium can't open)"""
+    import PyPDF2
+    
+    with open(filepath, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        text = ""
+        pages_to_read = min(5, len(pdf_reader.pages))
+        for page_num in range(pages_to_read):
+            page = pdf_reader.pages[page_num]
+            text += page.extract_text() + "\n"
+        return text
+
 def extract_pdf_text(filepath):
     """Extract text content from PDF file"""
+    # Imported lazily so the module loads quickly when no PDFs are processed
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        pdfium = None
+    
     try:
-        with open(filepath, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            # Extract first few pages for relevance check (avoid huge files)
-            pages_to_read = min(5, len(pdf_reader.pages))
-            for page_num in range(pages_to_read):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
-            return text[:5000]  # Limit text size for LLM processing
+        # Cheap sanity checks before handing the file to a PDF parser
+        if os.path.getsize(filepath) < MIN_PDF_BYTES:
+            return ""
+        with open(filepath, 'rb') as f:
+            if f.read(4) != b'%PDF':
+                return ""
+        
+        text = None
+        if pdfium is not None:
+            try:
+                # PDFium is not thread-safe, so calls within a process are serialised;
+                # the pipeline runs extraction in a process pool to parallelise it
+                with _pdfium_lock:
+                    pdf = pdfium.PdfDocument(filepath)
+                    try:
+                        # Extract first few pages for relevance check (avoid huge files)
+                        pages_to_read = min(5, len(pdf))
+                        text = "\n".join(pdf[i].get_textpage().get_text_range() for i in range(pages_to_read))
+                    finally:
+                        pdf.close()
+            except pdfium.PdfiumError:
+                pass
+        # Fall back to PyPDF2 if pypdfium2 is missing or can't open the file
+        if text is None:
+            text = _extract_pdf_text_pypdf2(filepath)
+        return text[:5000]  # Limit text size for LLM processing
     except Exception as e:
         print(f"Error extracting text from PDF: {e}")
         return ""
 
-def check_relevance_with_llm(query, title, pdf_text, model="qwen3:8b"):
+class RelevanceCache:
+    """SQLite cache of LLM relevance verdicts keyed by (query, title, content hash).
+    
+    With semantic=True, a verdict for the same paper is also reused when the query
+    embedding is within `threshold` cosine similarity of a previously judged query.
+    This needs the optional sentence-transformers package.
+    """
+    
+    def __init__(self, path, semantic=False, threshold=0.98):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.threshold = threshold
+        self.model = None
+        self._query_embeddings = {}
+        with self.lock:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS verdicts "
+                              "(key TEXT PRIMARY KEY, verdict INTEGER, ts INTEGER)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS semantic "
+                              "(paper TEXT, embedding BLOB, verdict INTEGER)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS semantic_paper ON semantic (paper)")
+            self.conn.commit()
+        
+        if semantic:
+            try:
+                from sentence_transformers import SentenceTransformer
+                self.model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+            except ImportError:
+                print("sentence-transformers not installed, semantic relevance cache disabled")
+    
+    @staticmethod
+    def _content_hash(pdf_text):
+        return hashlib.sha1(pdf_text[:2000].encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def _paper_hash(cls, title, pdf_text):
+        return hashlib.sha256(f"{title}\0{cls._content_hash(pdf_text)}".encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def _key(cls, query, title, pdf_text):
+        return hashlib.sha256(f"{query}\0{title}\0{cls._content_hash(pdf_text)}".encode('utf-8')).hexdigest()
+    
+    def _embed(self, query):
+        # Queries are constant for a whole run, so embed each one only once
+        if query not in self._query_embeddings:
+            self._query_embeddings[query] = self.model.encode(
+                query, normalize_embeddings=True).astype('float32')
+        return self._query_embeddings[query]
+    
+    def get(self, query, title, pdf_text):
+        """Return the cached verdict, or None on a miss"""
+        with self.lock:
+            row = self.conn.execute("SELECT verdict FROM verdicts WHERE key = ?",
+                                    (self._key(query, title, pdf_text),)).fetchone()
+            if row is not None:
+                return bool(row[0])
+            if self.model is None:
+                return None
+            rows = self.conn.execute("SELECT embedding, verdict FROM semantic WHERE paper = ?",
+                                     (self._paper_hash(title, pdf_text),)).fetchall()
+        if not rows:
+            return None
+        
+        import numpy as np
+        vectors = np.stack([np.frombuffer(embedding, dtype='float32') for embedding, _ in rows])
+        scores = vectors @ self._embed(query)
+        best = int(scores.argmax())
+        if scores[best] >= self.threshold:
+            return bool(rows[best][1])
+        return None
+    
+    def put(self, query, title, pdf_text, verdict):
+        """Store a verdict for this query and paper"""
+        embedding = self._embed(query).tobytes() if self.model is not None else None
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO verdicts (key, verdict, ts) VALUES (?, ?, ?)",
+                              (self._key(query, title, pdf_text), int(verdict), int(time.time())))
+            if embedding is not None:
+                self.conn.execute("INSERT INTO semantic (paper, embedding, verdict) VALUES (?, ?, ?)",
+                                  (self._paper_hash(title, pdf_text), embedding, int(verdict)))
+            self.conn.commit()
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class DownloadMetadata:
+    """SQLite record of the ETag/Last-Modified validators of downloaded files"""
+    
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS downloads "
+                              "(filepath TEXT PRIMARY KEY, url TEXT, etag TEXT, last_modified TEXT)")
+            self.conn.commit()
+    
+    def get(self, filepath):
+        """Return (url, etag, last_modified) for a downloaded file, or None"""
+        with self.lock:
+            return self.conn.execute("SELECT url, etag, last_modified FROM downloads WHERE filepath = ?",
+                                     (os.path.abspath(filepath),)).fetchone()
+    
+    def put(self, filepath, url, etag, last_modified):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?)",
+                              (os.path.abspath(filepath), url, etag, last_modified))
+            self.conn.commit()
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def check_relevance_with_llm(query, title, pdf_text, model="qwen3:8b", cache=None):
     """Check if PDF is relevant to query using Ollama LLM"""
+    return check_relevance_batch(query, [(title, pdf_text)], model=model, cache=cache)[0]
+
+def check_relevance_batch(query, items, model="qwen3:8b", cache=None):
+    """Check several (title, pdf_text) items against the query with one Ollama call.
+    
+    Returns a list of booleans in the same order as items.
+    """
+    verdicts = [None] * len(items)
+    if cache is not None:
+        for n, (title, pdf_text) in enumerate(items):
+            verdicts[n] = cache.get(query, title, pdf_text)
+    
+    uncached = [n for n, verdict in enumerate(verdicts) if verdict is None]
+    if not uncached:
+        return verdicts
+    
     try:
-        # Prepare prompt for LLM
-        prompt = f"""
-        Query: {query}
-        Paper Title: {title}
-        Paper Content (excerpt): {pdf_text[:2000]}...
-        
-        Based on the query and the paper title and content, is this paper relevant to the query?
-        Answer ONLY with "YES" if relevant or "NO" if not relevant.
-        """
+        # Prepare one prompt covering every uncached paper
+        prompt = "\n".join(
+            f"{k}. " + USER_PROMPT.format(title=items[n][0], text=items[n][1][:1500]) + "\n"
+            for k, n in enumerate(uncached, 1)
+        )
         
-        # Call Ollama API
-        response = requests.post(
+        # Call Ollama API with the same system prompt prefix for every batch
+        response = get_session().post(
             "http://localhost:11434/api/generate",
             json={
                 "model": model,
+                "system": SYSTEM_PROMPT.format(query=query),
                 "prompt": prompt,
-                "stream": False
+                "stream": False,
+                "think": False,
+                "options": {"num_predict": 6 * len(uncached), "temperature": 0}
             },
-            timeout=120
+            timeout=120 * len(uncached)
         )
         
         response.raise_for_status()
         result = response.json()
-        answer = result.get('response', '').strip().upper()
+        answer = result.get('response', '').upper()
         
-        return answer == "YES"
+        answers = {int(k): v == "YES" for k, v in re.findall(r'^\s*(\d+)\.\s*(YES|NO)', answer, re.M)}
+        for k, n in enumerate(uncached, 1):
+            if k in answers:
+                verdicts[n] = answers[k]
+                if cache is not None:
+                    cache.put(query, items[n][0], items[n][1], answers[k])
         
     except Exception as e:
         print(f"Error checking relevance with LLM: {e}")
-        return False  # Default to not relevant if LLM check fails
+    
+    # Default to not relevant if the LLM check fails or skips a paper
+    return [bool(verdict) for verdict in verdicts]
 
-def log_rejection(rejection_log_path, filename, query, url, reason):
-    """Log rejected papers to a text file"""
+class RejectionLogger:
+    """Append rejected papers to a text file through one buffered handle"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.f = None
+        self.lock = threading.Lock()
+    
+    def log(self, filename, query, url, reason):
+        try:
+            with self.lock:
+                # Opened on first use so queries without rejections leave no empty log
+                if self.f is None:
+                    self.f = open(self.path, 'a', encoding='utf-8', buffering=1 << 16)
+                self.f.write(f"Filename: {filename}\n"
+                             f"Query: {query}\n"
+                             f"URL: {url}\n"
+                             f"Reason: {reason}\n"
+                             + "-" * 50 + "\n")
+        except Exception as e:
+            print(f"Error logging rejection: {e}")
+    
+    def close(self):
+        with self.lock:
+            if self.f is not None:
+                self.f.close()
+
+def _fetch_page(url):
+    """Fetch a single search results page; failures are returned as the exception"""
     try:
-        with open(rejection_log_path, 'a', encoding='utf-8') as f:
-            f.write(f"Filename: {filename}\n")
-            f.write(f"Query: {query}\n")
-            f.write(f"URL: {url}\n")
-            f.write(f"Reason: {reason}\n")
-            f.write("-" * 50 + "\n")
+        # Go through the shared session so pages are served from the HTTP cache
+        response = search_get(url, timeout=30)
+        response.raise_for_status()
+        return response.content
     except Exception as e:
-        print(f"Error logging rejection: {e}")
+        return e
+
+def _fetch_pages(urls):
+    """Fetch pages concurrently, returning contents (or exceptions) in order"""
+    with ThreadPoolExecutor(max_workers=PAGE_CONCURRENCY) as executor:
+        return list(executor.map(_fetch_page, urls))
+
+def _arxiv_url(search_query, start, batch):
+    return (f"http://export.arxiv.org/api/query?"
+            f"search_query=all:{search_query}"
+            f"&start={start}"
+            f"&max_results={batch}")
+
+def _parse_arxiv_page(source):
+    """Stream-parse an arXiv Atom feed from a file-like object into (total_results, papers)"""
+    import lxml.etree as ET
+    
+    total = 0
+    papers = []
+    for _, elem in ET.iterparse(source, tag=(f'{ATOM_NS}entry', f'{OPENSEARCH_NS}totalResults')):
+        if elem.tag == f'{OPENSEARCH_NS}totalResults':
+            total = int(elem.text or 0)
+            continue
+        link = elem.find(f"{ATOM_NS}link[@type='application/pdf']")
+        if link is not None:
+            papers.append({
+                'title': elem.findtext(f'{ATOM_NS}title', '').strip(),
+                'pdf_url': link.get('href')
+            })
+        # Free the parsed entry and any siblings already processed
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    return total, papers
 
 def search_arxiv(query, max_results=None):
     """Search arXiv for papers - fetch all available"""
@@ -104,96 +574,87 @@ def search_arxiv(query, max_results=None):
     if max_results is None:
         max_results = 1000
     
-    papers = []
-    start = 0
     batch_size = 100
     
-    while len(papers) < max_results:
-        remaining = max_results - len(papers)
-        current_batch = min(batch_size, remaining)
-        
-        url = (f"http://export.arxiv.org/api/query?"
-               f"search_query=all:{search_query}"
-               f"&start={start}"
-               f"&max_results={current_batch}")
-        
-        try:
-            response = requests.get(url, timeout=30)
+    # First page tells us how many results there are in total
+    try:
+        with search_get(_arxiv_url(search_query, 0, min(batch_size, max_results)),
+                        timeout=30, stream=True) as response:
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'xml')
-            
-            entries = soup.find_all('entry')
-            if not entries:
-                break
-                
-            for entry in entries:
-                title = entry.title.text.strip()
-                pdf_url = entry.find('link', {'type': 'application/pdf'})['href']
-                papers.append({
-                    'title': title,
-                    'pdf_url': pdf_url
-                })
-            
-            start += current_batch
-            time.sleep(1)
-            
-            if len(entries) < current_batch:
-                break
-                
-        except Exception as e:
-            print(f"Error searching arXiv: {e}")
-            break
+            response.raw.decode_content = True
+            total, papers = _parse_arxiv_page(response.raw)
+    except Exception as e:
+        print(f"Error searching arXiv: {e}")
+        return []
+    
+    # Fetch the remaining pages concurrently
+    total = min(total, max_results)
+    urls = [_arxiv_url(search_query, start, min(batch_size, total - start))
+            for start in range(batch_size, total, batch_size)]
+    if urls:
+        for result in _fetch_pages(urls):
+            if isinstance(result, Exception):
+                print(f"Error searching arXiv: {result}")
+                continue
+            try:
+                papers.extend(_parse_arxiv_page(io.BytesIO(result))[1])
+            except Exception as e:
+                print(f"Error searching arXiv: {e}")
     
     return papers[:max_results]
 
+def _doaj_url(search_query, page, page_size):
+    return (f"https://doaj.org/api/search/articles/{search_query}?"
+            f"pageSize={page_size}&page={page}")
+
+def _parse_doaj_results(results):
+    """Extract papers with a fulltext PDF link from DOAJ results"""
+    papers = []
+    for item in results:
+        title = item.get('bibjson', {}).get('title', 'Unknown Title')
+        urls = item.get('bibjson', {}).get('link', [])
+        pdf_url = None
+        for link in urls:
+            if link.get('type') == 'fulltext' and link.get('url', '').endswith('.pdf'):
+                pdf_url = link['url']
+                break
+        
+        if pdf_url:
+            papers.append({
+                'title': title,
+                'pdf_url': pdf_url
+            })
+    return papers
+
 def search_doaj(query, max_results=None):
     """Search Directory of Open Access Journals - fetch all available"""
     search_query = quote_plus(query)
     
-    papers = []
-    page = 1
     page_size = 100
+    max_pages = 50
     
-    while True:
-        url = (f"https://doaj.org/api/search/articles/{search_query}?"
-               f"pageSize={page_size}&page={page}")
-        
-        try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-            
-            results = data.get('results', [])
-            if not results:
-                break
-                
-            for item in results:
-                title = item.get('bibjson', {}).get('title', 'Unknown Title')
-                urls = item.get('bibjson', {}).get('link', [])
-                pdf_url = None
-                for link in urls:
-                    if link.get('type') == 'fulltext' and link.get('url', '').endswith('.pdf'):
-                        pdf_url = link['url']
-                        break
-                
-                if pdf_url:
-                    papers.append({
-                        'title': title,
-                        'pdf_url': pdf_url
-                    })
-            
-            if len(results) < page_size:
-                break
-                
-            page += 1
-            time.sleep(1)
-            
-            if page > 50:
-                break
-                
-        except Exception as e:
-            print(f"Error searching DOAJ: {e}")
-            break
+    # First page tells us how many results there are in total
+    try:
+        response = search_get(_doaj_url(search_query, 1, page_size), timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        papers = _parse_doaj_results(data.get('results', []))
+    except Exception as e:
+        print(f"Error searching DOAJ: {e}")
+        return []
+    
+    # Fetch the remaining pages concurrently
+    last_page = min(-(-data.get('total', 0) // page_size), max_pages)
+    urls = [_doaj_url(search_query, page, page_size) for page in range(2, last_page + 1)]
+    if urls:
+        for result in _fetch_pages(urls):
+            if isinstance(result, Exception):
+                print(f"Error searching DOAJ: {result}")
+                continue
+            try:
+                papers.extend(_parse_doaj_results(json.loads(result).get('results', [])))
+            except Exception as e:
+                print(f"Error searching DOAJ: {e}")
     
     return papers
 
@@ -208,7 +669,7 @@ def search_pmc(query, max_results=50):
     search_url = f"https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?{urlencode(params)}"
     
     try:
-        response = requests.get(search_url, timeout=30)
+        response = search_get(search_url, timeout=30)
         response.raise_for_status()
         data = response.json()
         
@@ -225,7 +686,7 @@ def search_pmc(query, max_results=50):
         }
         
         summary_url = f"https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi?{urlencode(summary_params)}"
-        summary_response = requests.get(summary_url, timeout=30)
+        summary_response = search_get(summary_url, timeout=30)
         summary_response.raise_for_status()
         summary_data = summary_response.json()
         
@@ -259,7 +720,7 @@ def search_plos(query, max_results=30):
     }
     
     try:
-        response = requests.get(search_url, params=params, timeout=30)
+        response = search_get(search_url, params=params, timeout=30)
         response.raise_for_status()
         data = response.json()
         
@@ -292,7 +753,7 @@ def search_core(query, max_results=30):
     
     try:
         # This is a basic implementation - CORE has better results with API key
-        response = requests.get(search_url, params=params, timeout=30)
+        response = search_get(search_url, params=params, timeout=30)
         # CORE without API key has limited functionality
         return []
         
@@ -300,16 +761,264 @@ def search_core(query, max_results=30):
         print(f"Error searching CORE: {e}")
         return []
 
-def download_papers(query, base_folder, rejection_folder):
+def _download_paper(paper, n, total, source_name, i, query_folder, download_meta=None):
+    """Download one paper ahead of text extraction and the relevance check.
+    
+    n is the paper's position in the overall download list and i its index
+    within source_name's results (used in the filename).
+    
+    Returns (status, result) where status is one of 'fetched', 'downloaded',
+    'failed' or 'skipped'. result is the paper dict extended with 'source',
+    'filename', 'filepath', 'text' and 'reason' (the rejection log entry, or None).
+    Papers with status 'fetched' still need their text extracted and judged.
+    """
+    title = paper.get('title', 'Unknown')
+    pdf_url = paper.get('pdf_url')
+    
+    if not pdf_url:
+        return 'skipped', None
+        
+    # Create filename
+    filename = f"{source_name}_{i+1}_{sanitize_filename(title)}.pdf"
+    filepath = os.path.join(query_folder, filename)
+    result = dict(paper, title=title, source=source_name, filename=filename, filepath=filepath, text="", reason=None)
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+    
+    # Skip if file already exists and hasn't changed upstream
+    if os.path.exists(filepath):
+        if download_meta is None or is_unchanged(filepath, download_meta, headers):
+            print(f"Already exists: {filename[:50]}...")
+            return 'downloaded', result
+        print(f"Changed upstream, downloading again: {filename[:50]}...")
+        
+    # Download file temporarily
+    print(f"Downloading ({n+1}/{total}): {title[:60]}...")
+    
+    success = False
+    temp_filepath = None
+    
+    # Try original URL
+    download_success, temp_filepath = download_file(pdf_url, filepath, headers, download_meta)
+    if download_success:
+        success = True
+    # Try modified URL for arXiv
+    elif 'arxiv.org' in pdf_url and not pdf_url.endswith('.pdf'):
+        modified_url = pdf_url.replace('/abs/', '/pdf/') + '.pdf'
+        download_success, temp_filepath = download_file(modified_url, filepath, headers, download_meta)
+        if download_success:
+            success = True
+    
+    if not (success and temp_filepath):
+        print(f"✗ Failed: {title[:60]}")
+        result['reason'] = "Download failed"
+        return 'failed', result
+    
+    result['filepath'] = temp_filepath
+    return 'fetched', result
+
+def query_tokens(query):
+    """Words of the query used by the keyword prefilter"""
+    return frozenset(_TOK.findall(query.lower())) - STOPWORDS
+
+def _cheap_relevance(q_tokens, title, text):
+    """Keyword-overlap prefilter for obvious matches and misses.
+    
+    q_tokens comes from query_tokens(), computed once per query. Returns True if
+    most query words appear in the title, False if no query word appears in the
+    title or the start of the text, and None if the LLM should decide.
+    """
+    if not q_tokens:
+        return None  # Query is all stopwords, nothing to compare
+    overlap = len(q_tokens.intersection(_TOK.findall(title.lower()))) / len(q_tokens)
+    if overlap >= 0.6:
+        return True
+    if overlap == 0 and q_tokens.isdisjoint(_TOK.findall(text[:2000].lower())):
+        return False
+    return None
+
+def _judge_batch(query, q_tokens, pending, relevance_cache=None):
+    """Decide relevance for extracted papers, using the LLM only when the keyword
+    prefilter can't.
+    
+    Irrelevant files are removed and given a rejection reason.
+    """
+    verdicts = [_cheap_relevance(q_tokens, p['title'], p['text']) for p in pending]
+    undecided = [n for n, verdict in enumerate(verdicts) if verdict is None]
+    
+    for start in range(0, len(undecided), LLM_BATCH_SIZE):
+        batch = undecided[start:start + LLM_BATCH_SIZE]
+        print(f"Checking relevance with LLM for {len(batch)} papers...")
+        results = check_relevance_batch(query, [(pending[n]['title'], pending[n]['text']) for n in batch],
+                                        cache=relevance_cache)
+        for n, is_relevant in zip(batch, results):
+            verdicts[n] = is_relevant
+    
+    for paper, is_relevant in zip(pending, verdicts):
+        if is_relevant:
+            print(f"✓ Saved (relevant): {paper['filename']}")
+        else:
+            # Remove irrelevant file and log rejection
+            os.remove(paper['filepath'])
+            paper['reason'] = "Not relevant to query"
+            print(f"✗ Rejected (not relevant): {paper['filename'][:50]}...")
+
+class _PaperPipeline:
+    """Download -> extract -> LLM pipeline with a pool of worker threads per stage.
+    
+    The stages use different resources (network, CPU, Ollama) so they overlap;
+    papers move between them through bounded queues.
+    """
+    
+    def __init__(self, query, q_tokens, query_folder, rejection_logger, relevance_cache=None,
+                 download_meta=None):
+        self.query = query
+        self.q_tokens = q_tokens
+        self.query_folder = query_folder
+        self.download_meta = download_meta
+        self.rejection_logger = rejection_logger
+        self.relevance_cache = relevance_cache
+        self.download_q = queue.Queue(DOWNLOAD_QUEUE_SIZE)
+        self.extract_q = queue.Queue(PREFETCH_DEPTH)
+        self.verdict_q = queue.Queue(PREFETCH_DEPTH)
+        self.extract_pool = None
+        self.lock = threading.Lock()
+        self.downloaded = defaultdict(int)
+        self.rejected = defaultdict(int)
+    
+    def _record(self, status, result):
+        with self.lock:
+            if status == 'downloaded':
+                self.downloaded[result['source']] += 1
+            elif status == 'rejected':
+                self.rejected[result['source']] += 1
+        if result['reason']:
+            self.rejection_logger.log(result['filename'], self.query, result['pdf_url'], result['reason'])
+    
+    def _download_worker(self):
+        while True:
+            item = self.download_q.get()
+            try:
+                if item is None:
+                    return
+                status, result = _download_paper(*item, self.query_folder, self.download_meta)
+                if status == 'fetched':
+                    self.extract_q.put(result)
+                elif status != 'skipped':
+                    self._record(status, result)
+            except Exception as e:
+                print(f"Error downloading paper: {e}")
+            finally:
+                self.download_q.task_done()
+    
+    def _extract_worker(self):
+        while True:
+            result = self.extract_q.get()
+            try:
+                if result is None:
+                    return
+                result['text'] = self.extract_pool.submit(extract_pdf_text, result['filepath']).result()
+                if result['text']:
+                    self.verdict_q.put(result)
+                else:
+                    # Keep file if we can't extract text (assume relevant)
+                    print(f"✓ Saved (text extraction failed, assuming relevant): {result['filename']}")
+                    self._record('downloaded', result)
+            except Exception as e:
+                # Don't leave an unjudged file behind, it would count as already downloaded
+                print(f"Error extracting paper: {e}")
+                if os.path.exists(result['filepath']):
+                    os.remove(result['filepath'])
+                result['reason'] = f"Text extraction failed: {e}"
+                self._record('failed', result)
+            finally:
+                self.extract_q.task_done()
+    
+    def _llm_worker(self):
+        stopping = False
+        while not stopping:
+            result = self.verdict_q.get()
+            if result is None:
+                self.verdict_q.task_done()
+                return
+            
+            # Collect a batch until it is full, LLM_BATCH_WAIT passes or the pipeline stops
+            batch = [result]
+            deadline = time.monotonic() + LLM_BATCH_WAIT
+            while len(batch) < LLM_BATCH_SIZE:
+                try:
+                    result = self.verdict_q.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if result is None:
+                    self.verdict_q.task_done()
+                    stopping = True
+                    break
+                batch.append(result)
+            
+            try:
+                _judge_batch(self.query, self.q_tokens, batch, self.relevance_cache)
+                for paper in batch:
+                    self._record('rejected' if paper['reason'] else 'downloaded', paper)
+            except Exception as e:
+                print(f"Error checking relevance: {e}")
+            finally:
+                for _ in batch:
+                    self.verdict_q.task_done()
+    
+    def run(self, papers):
+        """Push (source_name, index, paper) tuples through every stage and wait for them"""
+        stages = [
+            (self.download_q, self._download_worker, DOWNLOAD_WORKERS),
+            (self.extract_q, self._extract_worker, EXTRACT_WORKERS),
+            (self.verdict_q, self._llm_worker, LLM_WORKERS),
+        ]
+        # Each extract worker hands its PDF to its own process, since PDFium
+        # only extracts one file at a time per process
+        self.extract_pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+        try:
+            threads = []
+            for _, target, count in stages:
+                for _ in range(count):
+                    thread = threading.Thread(target=target, daemon=True)
+                    thread.start()
+                    threads.append(thread)
+        
+            for n, (source_name, i, paper) in enumerate(papers):
+                self.download_q.put((paper, n, len(papers), source_name, i))
+        
+            # Once a stage has drained, everything it produced is queued for the next one
+            self.download_q.join()
+            self.extract_q.join()
+        
+            # Stop the workers; LLM workers flush their partial batch first
+            for q, _, count in stages:
+                for _ in range(count):
+                    q.put(None)
+            for thread in threads:
+                thread.join()
+        finally:
+            self.extract_pool.shutdown()
+
+def _dedup_key(paper):
+    """Normalised title used to spot the same paper indexed by several sources"""
+    key = re.sub(r'[\W_]', '', paper.get('title', '').lower())
+    # Fall back to the URL for papers whose title is missing
+    if key in ('', 'unknown', 'unknowntitle'):
+        return paper.get('pdf_url')
+    return key
+
+def download_papers(query, base_folder, rejection_folder, relevance_cache=None, download_meta=None):
     """Main function to download ALL papers for a query with LLM relevance checking"""
     # Create subfolder for this query
     safe_query = sanitize_filename(query)
+    q_tokens = query_tokens(query)
     query_folder = os.path.join(base_folder, safe_query)
     create_directory(query_folder)
     
     # Create rejection log file
-    rejection_log_path = os.path.join(rejection_folder, f"rejections_{sanitize_filename(query)}.txt")
     create_directory(rejection_folder)
+    rejection_log_path = os.path.join(rejection_folder, f"rejections_{safe_query}.txt")
+    rejection_logger = RejectionLogger(rejection_log_path)
     
     print(f"Searching for ALL papers related to: {query}")
     
@@ -322,9 +1031,8 @@ def download_papers(query, base_folder, rejection_folder):
         # ("CORE", search_core),  # Uncomment if you get API key
     ]
     
-    total_downloaded = 0
-    total_rejected = 0
-    
+    # Gather results from every source, keeping each paper's index within its source
+    all_papers = []
     for source_name, search_func in sources:
         print(f"\nSearching {source_name}...")
         papers = search_func(query)
@@ -334,78 +1042,48 @@ def download_papers(query, base_folder, rejection_folder):
             continue
             
         print(f"Found {len(papers)} papers from {source_name}")
-        downloaded_count = 0
-        rejected_count = 0
-        
-        for i, paper in enumerate(papers):
-            title = paper.get('title', 'Unknown')
-            pdf_url = paper.get('pdf_url')
-            
-            if not pdf_url:
-                continue
-                
-            # Create filename
-            filename = f"{source_name}_{i+1}_{sanitize_filename(title)}.pdf"
-            filepath = os.path.join(query_folder, filename)
-            
-            # Skip if file already exists
-            if os.path.exists(filepath):
-                print(f"Already exists: {filename[:50]}...")
-                downloaded_count += 1
-                continue
-                
-            # Download file temporarily
-            print(f"Downloading ({i+1}/{len(papers)}): {title[:60]}...")
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-            
-            success = False
-            temp_filepath = None
-            
-            # Try original URL
-            download_success, temp_filepath = download_file(pdf_url, filepath, headers)
-            if download_success:
-                success = True
-            # Try modified URL for arXiv
-            elif 'arxiv.org' in pdf_url and not pdf_url.endswith('.pdf'):
-                modified_url = pdf_url.replace('/abs/', '/pdf/') + '.pdf'
-                download_success, temp_filepath = download_file(modified_url, filepath, headers)
-                if download_success:
-                    success = True
-            
-            if success and temp_filepath:
-                # Check relevance with LLM
-                print(f"Checking relevance with LLM: {title[:60]}...")
-                pdf_text = extract_pdf_text(temp_filepath)
-                
-                if pdf_text:  # Only check if we could extract text
-                    is_relevant = check_relevance_with_llm(query, title, pdf_text)
-                    
-                    if is_relevant:
-                        downloaded_count += 1
-                        print(f"✓ Saved (relevant): {filename}")
-                    else:
-                        # Remove irrelevant file and log rejection
-                        os.remove(temp_filepath)
-                        log_rejection(rejection_log_path, filename, query, pdf_url, "Not relevant to query")
-                        rejected_count += 1
-                        print(f"✗ Rejected (not relevant): {filename[:50]}...")
-                else:
-                    # Keep file if we can't extract text (assume relevant)
-                    downloaded_count += 1
-                    print(f"✓ Saved (text extraction failed, assuming relevant): {filename}")
-            elif not success:
-                print(f"✗ Failed: {title[:60]}")
-                log_rejection(rejection_log_path, filename, query, pdf_url, "Download failed")
-            
-            time.sleep(2)  # Longer delay for LLM processing
-        
-        total_downloaded += downloaded_count
-        total_rejected += rejected_count
-        print(f"From {source_name}: {downloaded_count} downloaded, {rejected_count} rejected")
+        all_papers.extend((source_name, i, paper) for i, paper in enumerate(papers))
+    
+    # Drop papers already found by an earlier source
+    seen = set()
+    deduped = []
+    for source_name, i, paper in all_papers:
+        key = _dedup_key(paper)
+        if key in seen:
+            continue
+        seen.add(key)
+        deduped.append((source_name, i, paper))
+    
+    if len(deduped) < len(all_papers):
+        print(f"\nSkipping {len(all_papers) - len(deduped)} papers found in more than one source")
+    
+    pipeline = _PaperPipeline(query, q_tokens, query_folder, rejection_logger, relevance_cache,
+                              download_meta)
+    try:
+        pipeline.run(deduped)
+    finally:
+        rejection_logger.close()
     
+    print()
+    for source_name, _ in sources:
+        if pipeline.downloaded[source_name] or pipeline.rejected[source_name]:
+            print(f"From {source_name}: {pipeline.downloaded[source_name]} downloaded, "
+                  f"{pipeline.rejected[source_name]} rejected")
+    
+    total_downloaded = sum(pipeline.downloaded.values())
+    total_rejected = sum(pipeline.rejected.values())
     print(f"\nTOTAL for '{query}': {total_downloaded} downloaded, {total_rejected} rejected")
 
 def main():
+    parser = argparse.ArgumentParser(description="Download research papers with LLM relevance checking")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Bypass the on-disk HTTP cache for search requests")
+    parser.add_argument('--semantic-cache', action='store_true',
+                        help="Also reuse LLM verdicts for near-identical queries (needs sentence-transformers)")
+    args = parser.parse_args()
+    
+    init_session(use_cache=not args.no_cache)
+    
     # USER CONFIGURATION - MODIFY THESE VALUES
     QUERIES = [
         "rocket engine injector",
@@ -415,14 +1093,23 @@ def main():
     
     BASE_DOWNLOAD_FOLDER = r"Research Papers"  # Change this path
     REJECTION_LOG_FOLDER = r"Rejection Logs"   # Change this path
+    RELEVANCE_CACHE_PATH = r"relevance_cache.sqlite"  # Cache of LLM verdicts
+    DOWNLOAD_META_PATH = r".download_meta.sqlite"     # ETag/Last-Modified of downloaded files
     
     # Create base folder
     create_directory(BASE_DOWNLOAD_FOLDER)
     
+    relevance_cache = RelevanceCache(RELEVANCE_CACHE_PATH, semantic=args.semantic_cache)
+    download_meta = DownloadMetadata(DOWNLOAD_META_PATH)
+    
     # Process each query
-    for query in QUERIES:
-        download_papers(query, BASE_DOWNLOAD_FOLDER, REJECTION_LOG_FOLDER)
-        time.sleep(5)  # Longer delay between queries
+    try:
+        for query in QUERIES:
+            download_papers(query, BASE_DOWNLOAD_FOLDER, REJECTION_LOG_FOLDER, relevance_cache, download_meta)
+            time.sleep(5)  # Longer delay between queries
+    finally:
+        relevance_cache.close()
+        download_meta.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file